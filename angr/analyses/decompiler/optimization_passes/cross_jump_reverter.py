@@ -1,26 +1,23 @@
 from collections import defaultdict
-from typing import Any, Tuple, Dict, List, Optional
+from typing import Tuple, Dict, Optional
 from itertools import count
-import copy
 import logging
-import inspect
+import copy
+import weakref
 
 import networkx
-import networkx as nx
 
 import ailment
 from ailment import AILBlockWalkerBase
-from ailment.statement import Jump, ConditionalJump
-from ailment.expression import Const
 from .. import RegionIdentifier
 from ..utils import to_ail_supergraph, remove_labels
 from .duplication_reverter import add_labels
 
-from ..condition_processor import ConditionProcessor, EmptyBlockNotice
+from ..empty_node_remover import EmptyNodeRemover
+from ..region_simplifiers.goto import GotoSimplifier
 from .optimization_pass import OptimizationPass, OptimizationPassStage
 from ..goto_manager import GotoManager
 from ..structuring import RecursiveStructurer, PhoenixStructurer
-from ..utils import to_ail_supergraph
 
 l = logging.getLogger(__name__)
 
@@ -44,6 +41,31 @@ def _number_of_calls_in(graph: networkx.DiGraph) -> int:
 
         return counter.calls
 
+
+# cache of pristine supergraphs keyed (weakly) by the input graph. the pass may be scheduled
+# multiple times against the same function graph, and rebuilding the supergraph from scratch each
+# time is expensive. weak keys mean a collected graph drops its entry instead of pinning it - and
+# instead of letting a reused id() serve another function's supergraph.
+_supergraph_cache: "weakref.WeakKeyDictionary[networkx.DiGraph, Tuple[Tuple[int, int], networkx.DiGraph]]" = (
+    weakref.WeakKeyDictionary()
+)
+
+
+def _labelless_supergraph(graph: networkx.DiGraph) -> networkx.DiGraph:
+    fingerprint = (graph.number_of_nodes(), graph.number_of_edges())
+    cached = _supergraph_cache.get(graph)
+    if cached is not None and cached[0] == fingerprint:
+        supergraph = cached[1]
+    else:
+        # remove_labels already emits a fresh graph of copied nodes and never mutates its input,
+        # so there is no need to duplicate the input graph first
+        supergraph = to_ail_supergraph(remove_labels(graph))
+        _supergraph_cache[graph] = (fingerprint, supergraph)
+
+    # hand out a copy; the pass mutates its working graph and must not poison the cache
+    return networkx.DiGraph(supergraph)
+
+
 class CrossJumpReverter(OptimizationPass):
     """
     Copies bad blocks
@@ -73,9 +95,14 @@ class CrossJumpReverter(OptimizationPass):
         self.goto_manager: Optional[GotoManager] = None
         self.initial_gotos = None
 
-        self.func_name = self._func.name
-        self.binary_name = self.project.loader.main_object.binary_basename
-        self.target_name = f"{self.binary_name}.{self.func_name}"
+        # journal of graph edits made by _analyze_core, recorded as (inverse_op, *args) tuples so
+        # they can be reverted if the next structuring attempt fails
+        self._journal = []
+        self._journal_graph = None
+
+        # whether the last _analyze_core run left goto-carrying blocks it could not duplicate
+        self._more_candidates = False
+
         self.graph_copy = None
         self.analyze()
 
@@ -85,29 +112,46 @@ class CrossJumpReverter(OptimizationPass):
     def _analyze(self, cache=None):
         # for each block with no successors and more than 1 predecessors, make copies of this block and link it back to
         # the sources of incoming edges
-        self.graph_copy = to_ail_supergraph(remove_labels(networkx.DiGraph(self._graph)))
-        #self.graph_copy = to_ail_supergraph(networkx.DiGraph(self._graph))
-        self.last_graph = None
+        self.graph_copy = _labelless_supergraph(self._graph)
         graph_updated = False
 
-        # attempt at most N levels
+        # attempt at most N levels. graph_has_gotos doubles as a staleness marker: None means the
+        # goto information must be recomputed at the top of the round.
+        graph_has_gotos = None
         for _ in range(self.max_level):
-            success, graph_has_gotos = self._structure_graph()
-            if not success:
-                self.graph_copy = self.last_graph
-                break
+            if graph_has_gotos is None:
+                success, graph_has_gotos = self._structure_graph()
+                if not success:
+                    self._revert_graph_edits()
+                    break
 
             if not graph_has_gotos:
                 l.debug("Graph has no gotos. Leaving analysis...")
+                if not graph_updated:
+                    # the very first structuring found nothing to remove, i.e. initial_gotos is
+                    # empty; there is no output to produce, so skip the checks below entirely
+                    return
                 break
 
-            # make a clone of graph copy to recover in the event of failure
-            self.last_graph = self.graph_copy.copy()
+            # record the edits made below so they can be reverted in the event of failure
+            self._journal = []
+            self._journal_graph = self.graph_copy
             r = self._analyze_core(self.graph_copy)
             if not r:
                 break
             graph_updated = True
 
+            if not self._more_candidates:
+                # every goto-carrying block was just duplicated; validate the edits and refresh
+                # the goto set right away. restructuring can surface new goto-carrying blocks, so
+                # keep iterating on the fresh result instead of stopping here.
+                success, graph_has_gotos = self._structure_graph()
+                if not success:
+                    self._revert_graph_edits()
+                    break
+            else:
+                graph_has_gotos = None
+
         # the output graph
         if graph_updated and self.graph_copy is not None:
             if self.goto_manager is not None and not (len(self.initial_gotos) < len(self.goto_manager.gotos)):
@@ -115,6 +159,26 @@ class CrossJumpReverter(OptimizationPass):
                 #self.out_graph = add_labels(remove_labels(self.graph_copy))
                 self.out_graph = add_labels(self.graph_copy)
 
+    def _revert_graph_edits(self):
+        # undo the edits recorded by the last _analyze_core run, in LIFO order, restoring the graph
+        # that last structured successfully
+        if self._journal_graph is None:
+            self.graph_copy = None
+            return
+
+        graph = self._journal_graph
+        for op, *args in reversed(self._journal):
+            if op == "add_edge":
+                graph.add_edge(*args)
+            elif op == "remove_edge":
+                graph.remove_edge(*args)
+            elif op == "add_node":
+                graph.add_node(*args)
+            elif op == "remove_node":
+                graph.remove_node(*args)
+
+        self._journal = []
+        self.graph_copy = graph
 
     #
     # taken from deduplicator
@@ -124,12 +188,19 @@ class CrossJumpReverter(OptimizationPass):
         # reset gotos
         self.goto_manager = None
 
-        # do structuring
+        # do structuring. note that this recomputes regions over the full graph even though each
+        # _analyze_core round only touches a handful of blocks; add_labels / remove_labels below
+        # recreate every node object, so region results cannot be keyed on node identity across
+        # rounds until RegionIdentifier grows an incremental API.
         self.graph_copy = add_labels(self.graph_copy)
         self._ri = self.project.analyses[RegionIdentifier].prep(kb=self.kb)(
             self._func, graph=self.graph_copy, cond_proc=self._ri.cond_proc, force_loop_single_exit=False,
             complete_successors=True
         )
+        # the deepcopy is required: the region's leaves are the labeled nodes of self.graph_copy,
+        # and the structurer strips jump statements from them in place; remove_labels below would
+        # then clone the mutilated blocks into the working graph. recursive_copy is not enough as
+        # it shares the leaf blocks.
         rs = self.project.analyses[RecursiveStructurer].prep(kb=self.kb)(
             copy.deepcopy(self._ri.region),
             cond_proc=self._ri.cond_proc,
@@ -138,68 +209,143 @@ class CrossJumpReverter(OptimizationPass):
         )
         self.graph_copy = remove_labels(self.graph_copy)
         if not rs.result.nodes:
-            l.critical(f"Failed to redo structuring on {self.target_name}")
+            # only resolve the name on the failure path; it is never needed otherwise
+            binary_name = self.project.loader.main_object.binary_basename
+            l.critical(f"Failed to redo structuring on {binary_name}.{self._func.name}")
             return False, False
 
-        rs = self.project.analyses.RegionSimplifier(self._func, rs.result, kb=self.kb, variable_kb=self._variable_kb)
-        self.goto_manager = rs.goto_manager
+        # this pass only consumes the goto information, never the simplified region itself, so run
+        # just the two RegionSimplifier stages that feed the goto manager (empty-node removal and
+        # goto simplification) instead of its whole pipeline
+        region = EmptyNodeRemover(rs.result, claripy_ast_conditions=False).result
+        simplifier = GotoSimplifier(region, function=self._func, kb=self.kb)
+        self.goto_manager = GotoManager(self._func, gotos=simplifier.irreducible_gotos)
         if self.initial_gotos is None:
             self.initial_gotos = self.goto_manager.gotos
 
-        return True, len(self.goto_manager.gotos) != 0 if self.goto_manager else False
+        return True, len(self.goto_manager.gotos) != 0
+
+    def _gotos_by_block(self, graph: networkx.DiGraph) -> Dict:
+        """
+        Invert the goto manager into a block -> gotos index with a single pass over the graph,
+        mirroring the matching logic of GotoManager.gotos_in_block without rescanning the full
+        goto list for every node.
+        """
+        blocks_by_addr = defaultdict(list)
+        blocks_by_ins_addr = defaultdict(list)
+        for node in graph.nodes:
+            blocks_by_addr[node.addr].append(node)
+            for stmt in node.statements:
+                if "ins_addr" in stmt.tags:
+                    blocks_by_ins_addr[stmt.ins_addr].append(node)
+
+        gotos_by_block = defaultdict(set)
+        for goto in self.goto_manager.gotos:
+            for node in blocks_by_addr.get(goto.src_addr, ()):
+                gotos_by_block[node].add(goto)
+            for node in blocks_by_ins_addr.get(goto.src_ins_addr, ()):
+                gotos_by_block[node].add(goto)
+
+        return gotos_by_block
 
     def _analyze_core(self, graph: networkx.DiGraph):
-        # collect all nodes that have a goto
-        to_update = {}
+        gotos_by_block = self._gotos_by_block(graph)
+        goto_blocks = len(gotos_by_block)
+
+        # this pass only needs successor sets, which are much cheaper to query than the full
+        # networkx adjacency structure. mirror the graph into a plain dict once, plan every
+        # mutation against it, and replay the plan onto the real graph at the end.
+        succs = {node: set(graph.successors(node)) for node in graph}
+
+        updates = 0
+        edges_to_remove = []
+        edges_to_add = []
+        removal_candidates = {}
+        dup_counts = defaultdict(int)
+
+        # drive the scan in graph insertion order: gotos_by_block's order follows the goto set,
+        # which hashes by salted strings and would make candidate (and thus output) order vary
+        # across runs
         for node in graph.nodes:
-            gotos = self.goto_manager.gotos_in_block(node)
+            gotos = gotos_by_block.get(node)
+            if not gotos:
+                continue
+
             # TODO: support if-stmts
-            if not gotos or len(gotos) >= 2:
+            if len(gotos) >= 2:
                 continue
 
-            # only single reaching gotos
-            goto = list(gotos)[0]
-            for goto_target in graph.successors(node):
-                if goto_target.addr == goto.dst_addr:
-                    break
-            else:
-                goto_target = None
+            # cheap structural rejects first: a goto target must be among the successors
+            node_succs = succs[node]
+            if not node_succs:
+                continue
 
+            # only single reaching gotos
+            goto = next(iter(gotos))
+            succ_by_addr = {succ.addr: succ for succ in node_succs}
+            goto_target = succ_by_addr.get(goto.dst_addr)
             if goto_target is None:
                 continue
 
-            if graph.out_degree(goto_target) != 1:
+            if len(succs[goto_target]) != 1:
                 continue
 
+            # the statement walk is the most expensive test, so it always goes last
             counter = AILCallCounter()
             counter.walk(goto_target)
             if counter.calls > self.call_dup_max:
                 continue
 
-            # og_block -> suc_block (goto target)
-            to_update[node] = goto_target
+            # the candidate passed every filter; plan its duplication right away. the copy only
+            # needs to be re-wired, never rewritten, so the statements themselves can be shared
+            # with the original block.
+            updates += 1
+            cp = ailment.Block(
+                goto_target.addr,
+                goto_target.original_size,
+                statements=list(goto_target.statements),
+                idx=next(self.node_idx),
+            )
 
-        if not to_update:
-            return False
+            # remove this goto edge from original
+            edges_to_remove.append((node, goto_target))
+            self._journal.append(("add_edge", node, goto_target))
 
-        for target_node, goto_node in to_update.items():
-            # always make a copy if there is a goto edge
-            cp = copy.deepcopy(goto_node)
-            cp.idx = next(self.node_idx)
+            # add a new edge to the copy, and make sure the copy has the same successor as before!
+            suc = next(iter(succs[goto_target]))
+            edges_to_add.append((node, cp))
+            edges_to_add.append((cp, suc))
+            # dropping the copy (and both its edges) undoes the two additions above
+            self._journal.append(("remove_node", cp))
 
-            # remove this goto edge from original
-            graph.remove_edge(target_node, goto_node)
+            dup_counts[goto_target] += 1
+            removal_candidates[goto_target] = suc
 
-            # add a new edge to the copy
-            graph.add_edge(target_node, cp)
+        # any goto-carrying block we could not handle is a reason to rescan after restructuring
+        self._more_candidates = updates < goto_blocks
 
-            # make sure the copy has the same successor as before!
-            suc = list(graph.successors(goto_node))[0]
-            graph.add_edge(cp, suc)
+        if not updates:
+            return False
 
-            # kill the original if we made enough copies to drain in-degree
-            if graph.in_degree(goto_node) == 0:
-                graph.remove_node(goto_node)
+        # kill the originals if we made enough copies to drain their in-degree. every planned
+        # duplication removes exactly one distinct incoming edge, so the final in-degree follows
+        # arithmetically from the (not yet mutated) graph without any further queries - except for
+        # edges other planned copies add INTO a node: a drained node that is also some copy's
+        # successor (a goto chain handled in one round) must stay, or that copy ends up with no
+        # successor at all.
+        planned_copy_targets = set(removal_candidates.values())
+        nodes_to_remove = []
+        for goto_node, suc in removal_candidates.items():
+            if goto_node in planned_copy_targets:
+                continue
+            if graph.in_degree(goto_node) == dup_counts[goto_node]:
+                nodes_to_remove.append(goto_node)
+                self._journal.append(("add_node", goto_node))
+                self._journal.append(("add_edge", goto_node, suc))
+
+        graph.remove_edges_from(edges_to_remove)
+        graph.add_edges_from(edges_to_add)
+        graph.remove_nodes_from(nodes_to_remove)
 
         # TODO: add single chain later:
         # i.e., we need to copy the entire chain of single successor nodes in
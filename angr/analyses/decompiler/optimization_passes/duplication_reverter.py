@@ -729,21 +729,36 @@ def copy_graph_and_nodes(graph: nx.DiGraph, new_idx=False):
     return new_graph
 
 
-def shared_common_conditional_dom(nodes, graph: nx.DiGraph):
+def graph_idoms(graph: nx.DiGraph) -> Optional[Dict]:
+    """
+    Compute the immediate dominators of the graph from its unique entry block. Returns None when
+    the graph has no entry block. Callers that query dominance many times against a graph they do
+    not mutate in between (e.g., a candidate-collection loop) should compute this once and pass
+    the result along; it must not be reused across graph edits.
+    """
+    try:
+        entry_blk = [node for node in graph.nodes if graph.in_degree(node) == 0][0]
+    except IndexError:
+        return None
+
+    return nx.algorithms.immediate_dominators(graph, entry_blk)
+
+
+def shared_common_conditional_dom(nodes, graph: nx.DiGraph, idoms: Optional[Dict] = None):
     """
     Takes n nodes and returns True only if all the nodes are dominated by the same node, which must be
     a ConditionalJump
 
     @param nodes:
     @param graph:
+    @param idoms:   precomputed result of graph_idoms(graph); only pass this if the graph has not
+                    been mutated since it was computed
     @return:
     """
-    try:
-        entry_blk = [node for node in graph.nodes if graph.in_degree(node) == 0][0]
-    except IndexError:
+    if idoms is None:
+        idoms = graph_idoms(graph)
+    if idoms is None:
         return None
-
-    idoms = nx.algorithms.immediate_dominators(graph, entry_blk)
     """
     ancestors = {
         node: list(nx.ancestors(graph, node)) for node in nodes
@@ -2151,6 +2166,10 @@ class DuplicationOptReverter(OptimizationPass):
 
     def _find_initial_candidates(self) -> List[Tuple[Block, Block]]:
         initial_candidates = []
+        # neither graph is mutated while candidates are collected, so the dominator trees can be
+        # computed once and shared across every pair
+        read_idoms = graph_idoms(self.read_graph)
+        write_idoms = graph_idoms(self.write_graph)
         for b0, b1 in combinations(self.read_graph.nodes, 2):
             # TODO: find a better fix for this! Some duplicated nodes need destruction!
             # skip purposefully duplicated nodes
@@ -2169,7 +2188,7 @@ class DuplicationOptReverter(OptimizationPass):
                 continue
 
             # must share a common dominator
-            if not shared_common_conditional_dom([b0, b1], self.read_graph):
+            if not shared_common_conditional_dom([b0, b1], self.read_graph, idoms=read_idoms):
                 continue
 
             # special case: when we only have a single stmt
@@ -2224,7 +2243,7 @@ class DuplicationOptReverter(OptimizationPass):
                 if stmt_in_common:
                     pair = (b0, b1)
                     # only append pairs that share a dominator
-                    if shared_common_conditional_dom(pair, self.write_graph) is not None:
+                    if shared_common_conditional_dom(pair, self.write_graph, idoms=write_idoms) is not None:
                         initial_candidates.append(pair)
 
                     break
@@ -1,14 +1,13 @@
-from typing import Optional, Tuple, Union, List, DefaultDict, TYPE_CHECKING
-from collections import defaultdict, OrderedDict
-import copy
-from typing import Optional, Tuple, Union, TYPE_CHECKING
+from typing import Optional, Tuple, Union, List, Dict, DefaultDict
+from collections import defaultdict, deque, OrderedDict
 import logging
+import copy
 
 import networkx
 
 from ailment import Block, AILBlockWalkerBase
 from ailment.statement import ConditionalJump, Label, Assignment, Jump
-from ailment.expression import Expression, BinaryOp, Const, Register, Load
+from ailment.expression import Expression, BinaryOp, Const, Register, Load, UnaryOp, Convert
 from .. import RegionIdentifier
 from ..condition_processor import ConditionProcessor
 from ..goto_manager import GotoManager
@@ -19,9 +18,6 @@ from ..utils import first_nonlabel_statement, remove_last_statement
 from ..structuring.structurer_nodes import IncompleteSwitchCaseHeadStatement, SequenceNode, MultiNode
 from .optimization_pass import OptimizationPass, OptimizationPassStage, MultipleBlocksException
 
-if TYPE_CHECKING:
-    from ailment.expression import UnaryOp, Convert
-
 _l = logging.getLogger(name=__name__)
 
 
@@ -38,6 +34,7 @@ class Case:
         "value",
         "target",
         "next_addr",
+        "_hash",
     )
 
     def __init__(
@@ -50,6 +47,7 @@ class Case:
         self.value = value
         self.target = target
         self.next_addr = next_addr
+        self._hash = None
 
     def __repr__(self):
         if self.value == "default":
@@ -69,9 +67,13 @@ class Case:
         )
 
     def __hash__(self):
-        return hash(
-            (Case, self.original_node, self.node_type, self.variable_hash, self.value, self.target, self.next_addr)
-        )
+        # cases are immutable once constructed and get hashed repeatedly during subset tests, so
+        # compute the tuple hash once
+        if self._hash is None:
+            self._hash = hash(
+                (Case, self.original_node, self.node_type, self.variable_hash, self.value, self.target, self.next_addr)
+            )
+        return self._hash
 
 
 class StableVarExprHasher(AILBlockWalkerBase):
@@ -82,36 +84,71 @@ class StableVarExprHasher(AILBlockWalkerBase):
     def __init__(self, expr: Expression):
         super().__init__()
         self.expr = expr
-        self._hash_lst = []
+        self._running_hash = 0
 
         self.walk_expression(expr)
-        self.hash = hash(tuple(self._hash_lst))
+        self.hash = self._running_hash
+
+    def _mix(self, obj):
+        # order-sensitive rolling combine (same multiplier the tuple hash uses); accumulating into
+        # a single int avoids building a list and a tuple per hashed expression
+        self._running_hash = (self._running_hash * 1000003 + hash(obj)) & 0xFFFF_FFFF_FFFF_FFFF
 
     def _handle_expr(self, expr_idx: int, expr: Expression, stmt_idx: int, stmt, block: Optional[Block]):
         if hasattr(expr, "variable"):
-            self._hash_lst.append(expr.variable)
+            self._mix(expr.variable)
+            return
+        # dispatch on the exact expression type directly; the generic walker resolves the handler
+        # through an attribute lookup per node, which adds up in this tight walk. unknown types
+        # (including subclasses) still fall through to the generic path.
+        handler = self._DISPATCH.get(type(expr))
+        if handler is not None:
+            handler(self, expr_idx, expr, stmt_idx, stmt, block)
         else:
             super()._handle_expr(expr_idx, expr, stmt_idx, stmt, block)
 
     def _handle_Load(self, expr_idx: int, expr: Load, stmt_idx: int, stmt, block: Optional[Block]):
-        self._hash_lst.append("Load")
+        self._mix("Load")
         super()._handle_expr(expr_idx, expr, stmt_idx, stmt, block)
 
     def _handle_BinaryOp(self, expr_idx: int, expr: BinaryOp, stmt_idx: int, stmt, block: Optional[Block]):
-        self._hash_lst.append(expr.op)
+        self._mix(expr.op)
         super()._handle_BinaryOp(expr_idx, expr, stmt_idx, stmt, block)
 
-    def _handle_UnaryOp(self, expr_idx: int, expr: "UnaryOp", stmt_idx: int, stmt, block: Optional[Block]):
-        self._hash_lst.append(expr.op)
+    def _handle_UnaryOp(self, expr_idx: int, expr: UnaryOp, stmt_idx: int, stmt, block: Optional[Block]):
+        self._mix(expr.op)
         super()._handle_UnaryOp(expr_idx, expr, stmt_idx, stmt, block)
 
     def _handle_Const(self, expr_idx: int, expr: Const, stmt_idx: int, stmt, block: Optional[Block]):
-        self._hash_lst.append((expr.value, expr.bits))
+        self._mix(expr.value)
+        self._mix(expr.bits)
 
-    def _handle_Convert(self, expr_idx: int, expr: "Convert", stmt_idx: int, stmt, block: Optional[Block]):
-        self._hash_lst.append(expr.to_bits)
+    def _handle_Convert(self, expr_idx: int, expr: Convert, stmt_idx: int, stmt, block: Optional[Block]):
+        self._mix(expr.to_bits)
         super()._handle_Convert(expr_idx, expr, stmt_idx, stmt, block)
 
+    _DISPATCH = {
+        Load: _handle_Load,
+        BinaryOp: _handle_BinaryOp,
+        UnaryOp: _handle_UnaryOp,
+        Const: _handle_Const,
+        Convert: _handle_Convert,
+    }
+
+
+# cache of StableVarExprHasher results keyed by expression identity. comparison nodes are revisited
+# across candidate heads during classification, and re-walking the same expression tree each time
+# is pure waste. cleared at the start of every _analyze.
+_HASHER_CACHE: Dict[int, int] = {}
+
+
+def _stable_varhash(expr: Expression) -> int:
+    h = _HASHER_CACHE.get(id(expr))
+    if h is None:
+        h = StableVarExprHasher(expr).hash
+        _HASHER_CACHE[id(expr)] = h
+    return h
+
 
 class LoweredSwitchSimplifier(OptimizationPass):
     """
@@ -141,34 +178,46 @@ class LoweredSwitchSimplifier(OptimizationPass):
         return True, None
 
     def _analyze(self, cache=None):
-        # graph must have some valid gotos
-        graph_copy = networkx.DiGraph(self._graph)
-        initial_gotos = self._structure_and_find_gotos(graph_copy)
+        # expression identities are only stable within one analysis run
+        _HASHER_CACHE.clear()
+
+        # look for candidates before anything else: most functions have none, and this skips the
+        # graph copies and the far more expensive structuring call entirely for them
+        variablehash_to_cases = self._find_cascading_switch_variable_comparisons()
+        if not any(caselists for caselists in variablehash_to_cases.values()):
+            return
+
+        # graph must have some valid gotos. DiGraph.copy duplicates the adjacency dicts directly,
+        # unlike the generic DiGraph(...) conversion constructor which re-adds every edge
+        initial_gotos = self._structure_and_find_gotos(self._graph.copy())
         if not initial_gotos:
             # two possibilities:
             # 1. structuring failed, so we should exit early
             # 2. this functions has no gotos, no need to try
             return
 
-        variablehash_to_cases = self._find_cascading_switch_variable_comparisons()
-
-        if not variablehash_to_cases:
-            return
-
         # reset the copy
-        graph_copy = networkx.DiGraph(self._graph)
+        graph_copy = self._graph.copy()
         self.out_graph = graph_copy
-        node_to_heads = defaultdict(set)
+        # most successors only ever see a single switch head, so track the first head per
+        # successor in a plain dict and materialize a head list only for the rare shared ones
+        first_head = {}
+        shared_heads = {}
+        graph_changed = False
+
+        # built once and maintained incrementally below; rebuilding it for every caselist scans
+        # the entire graph each time
+        existing_nodes_by_addr = {nn.addr: nn for nn in graph_copy}
 
         for _, caselists in variablehash_to_cases.items():
-            for cases, redundant_nodes in caselists:
-                original_nodes = [case.original_node for case in cases if case.value != "default"]
-                original_head: Block = original_nodes[0]
-                original_nodes = original_nodes[1:]
-                existing_nodes_by_addr = {nn.addr: nn for nn in graph_copy}
+            for cases, non_default_nodes, redundant_nodes in caselists:
+                graph_changed = True
+                original_head: Block = non_default_nodes[0]
+                original_nodes = non_default_nodes[1:]
 
                 case_addrs = []
                 delayed_edges = []
+                copied_case_nodes = []
                 for idx, case in enumerate(cases):
                     if idx == 0 or all(
                         isinstance(stmt, (Label, ConditionalJump)) for stmt in case.original_node.statements
@@ -192,18 +241,21 @@ class LoweredSwitchSimplifier(OptimizationPass):
                         delayed_edges.append((None, case_node_copy))
                         target_node = existing_nodes_by_addr[case.target]
                         delayed_edges.append((case_node_copy, target_node))
+                        copied_case_nodes.append(case_node_copy)
 
                 expr = cases[0].expr
 
                 # create a fake switch-case head node
+                last_stmt = original_head.statements[-1]
                 switch_stmt = IncompleteSwitchCaseHeadStatement(
-                    original_head.statements[-1].idx, expr, case_addrs, ins_addr=original_head.statements[-1].ins_addr
+                    last_stmt.idx, expr, case_addrs, ins_addr=last_stmt.ins_addr
                 )
                 new_head = original_head.copy()
                 # replace the last instruction of the head node with switch_node
                 new_head.statements[-1] = switch_stmt
                 # update the block
                 self._update_block(original_head, new_head)
+                existing_nodes_by_addr[new_head.addr] = new_head
 
                 # sanity check that no switch head points to either itself
                 # or to any if-head that was merged into the new switch head; this
@@ -212,42 +264,62 @@ class LoweredSwitchSimplifier(OptimizationPass):
                     self.out_graph = None
                     return
 
-                # add edges between the head and case nodes
+                # plan the edges between the head and case nodes, then apply them and drop the
+                # original and redundant nodes in bulk instead of mutating the graph per node
+                new_head_edges = []
                 for onode in original_nodes:
-                    successors = list(graph_copy.successors(onode))
-                    for succ in successors:
+                    for succ in graph_copy.successors(onode):
                         if succ not in original_nodes:
-                            graph_copy.add_edge(new_head, succ)
-                            node_to_heads[succ].add(new_head)
-                    graph_copy.remove_node(onode)
+                            new_head_edges.append((new_head, succ))
+                            if succ in shared_heads:
+                                if new_head not in shared_heads[succ]:
+                                    shared_heads[succ].append(new_head)
+                            elif first_head.get(succ, new_head) is not new_head:
+                                shared_heads[succ] = [first_head[succ], new_head]
+                            else:
+                                first_head[succ] = new_head
+                for onode in original_nodes:
+                    if existing_nodes_by_addr.get(onode.addr) is onode:
+                        del existing_nodes_by_addr[onode.addr]
                 for onode in redundant_nodes:
-                    graph_copy.remove_node(onode)
+                    if existing_nodes_by_addr.get(onode.addr) is onode:
+                        del existing_nodes_by_addr[onode.addr]
+                graph_copy.add_edges_from(new_head_edges)
+                graph_copy.remove_nodes_from(original_nodes)
+                graph_copy.remove_nodes_from(redundant_nodes)
                 # apply delayed edges
-                for src, dst in delayed_edges:
-                    if src is None:
-                        graph_copy.add_edge(new_head, dst)
-                    else:
-                        graph_copy.add_edge(src, dst)
+                graph_copy.add_edges_from(
+                    (src if src is not None else new_head, dst) for src, dst in delayed_edges
+                )
+                # the copied case nodes share their originals' addresses, so they can only take
+                # over an index slot once the originals above have been dropped
+                for case_node_copy in copied_case_nodes:
+                    existing_nodes_by_addr.setdefault(case_node_copy.addr, case_node_copy)
 
         # find shared case nodes and make copies of them
         # note that this only solves cases where *one* node is shared between switch-cases. a more general solution
         # requires jump threading reverter.
-        for succ_node, heads in node_to_heads.items():
-            if len(heads) > 1:
-                # each head gets a copy of the node!
-                node_successors = list(graph_copy.successors(succ_node))
-                next_id = 0 if succ_node.idx is None else succ_node.idx + 1
-                graph_copy.remove_node(succ_node)
-                for head in heads:
-                    node_copy = succ_node.copy()
-                    node_copy.idx = next_id
-                    next_id += 1
-                    graph_copy.add_edge(head, node_copy)
-                    for succ in node_successors:
-                        if succ is succ_node:
-                            graph_copy.add_edge(node_copy, node_copy)
-                        else:
-                            graph_copy.add_edge(node_copy, succ)
+        for succ_node, heads in shared_heads.items():
+            # each head gets a copy of the node!
+            node_successors = list(graph_copy.successors(succ_node))
+            next_id = 0 if succ_node.idx is None else succ_node.idx + 1
+            graph_copy.remove_node(succ_node)
+            for head in heads:
+                node_copy = succ_node.copy()
+                node_copy.idx = next_id
+                next_id += 1
+                graph_copy.add_edge(head, node_copy)
+                for succ in node_successors:
+                    if succ is succ_node:
+                        graph_copy.add_edge(node_copy, node_copy)
+                    else:
+                        graph_copy.add_edge(node_copy, succ)
+
+        if not graph_changed:
+            # every caselist was filtered out, so the copy is identical to the input graph; there
+            # is nothing to validate and no reason to pay for a second structuring
+            self.out_graph = None
+            return
 
         # find gotos after doing work!
         new_gotos = self._structure_and_find_gotos(self.out_graph)
@@ -260,23 +332,33 @@ class LoweredSwitchSimplifier(OptimizationPass):
     def _find_cascading_switch_variable_comparisons(self):
         sorted_nodes = GraphUtils.quasi_topological_sort_nodes(self._graph)
         variable_comparisons = OrderedDict()
+        # both classifiers need the first non-label statement of a node; share one walk of the
+        # label prefix per node between them
+        fnl_cache = {}
         for node in sorted_nodes:
-            r = self._find_switch_variable_comparison_type_a(node)
+            r = self._find_switch_variable_comparison_eq(node, fnl_cache)
             if r is not None:
-                variable_comparisons[node] = ("a",) + r
+                variable_comparisons[node] = r
                 continue
-            r = self._find_switch_variable_comparison_type_b(node)
-            if r is not None:
-                variable_comparisons[node] = ("b",) + r
-                continue
-            r = self._find_switch_variable_comparison_type_c(node)
+            r = self._find_switch_variable_comparison_type_c(node, fnl_cache)
             if r is not None:
                 variable_comparisons[node] = ("c",) + r
                 continue
 
+        # comparison nodes are revisited while chasing cascades, so resolve each node's
+        # (non-self) successors and their addr lookup exactly once
+        succ_cache = {}
+        for n in variable_comparisons:
+            succs = tuple(succ for succ in self._graph.successors(n) if succ is not n)
+            succ_cache[n] = (succs, {succ.addr: succ for succ in succs})
+
         varhash_to_caselists: DefaultDict[int, List[Tuple[List[Case], List]]] = defaultdict(list)
         used_nodes = set()
 
+        # hoisted graph views: the loops below otherwise chase the same networkx attributes on
+        # every single visit
+        g_in_degree = self._graph.in_degree
+
         for head in variable_comparisons:
             if head in used_nodes:
                 continue
@@ -285,9 +367,9 @@ class LoweredSwitchSimplifier(OptimizationPass):
             extra_cmp_nodes = []
             default_case_candidates = {}
             last_comp = None
-            stack = [(head, 0, 0xFFFF_FFFF_FFFF_FFFF)]
+            stack = deque([(head, 0, 0xFFFF_FFFF_FFFF_FFFF)])
             while stack:
-                comp, min_, max_ = stack.pop(0)
+                comp, min_, max_ = stack.popleft()
                 comp_type, variable_hash, op, expr, value, target, next_addr = variable_comparisons[comp]
                 if cases:
                     last_varhash = cases[-1].variable_hash
@@ -314,13 +396,12 @@ class LoweredSwitchSimplifier(OptimizationPass):
 
                     if comp is not head:
                         # non-head node has at most one predecessor
-                        if self._graph.in_degree[comp] > 1:
+                        if g_in_degree[comp] > 1:
                             break
 
-                    successors = [succ for succ in self._graph.successors(comp) if succ is not comp]
-                    succ_addrs = {succ.addr for succ in successors}
-                    if target in succ_addrs:
-                        next_comp_addr = next(iter(succ_addr for succ_addr in succ_addrs if succ_addr != target), None)
+                    _, succ_by_addr = succ_cache[comp]
+                    if target in succ_by_addr:
+                        next_comp_addr = next((succ_addr for succ_addr in succ_by_addr if succ_addr != target), None)
                         if next_comp_addr is None:
                             break
                         try:
@@ -350,12 +431,11 @@ class LoweredSwitchSimplifier(OptimizationPass):
                     # gt always indicates new subtrees
                     gt_addr, le_addr = target, next_addr
                     if last_varhash is None or last_varhash == variable_hash:
-                        successors = [succ for succ in self._graph.successors(comp) if succ is not comp]
-                        succ_addrs = {succ.addr for succ in successors}
-                        if succ_addrs != {gt_addr, le_addr}:
+                        _, succ_by_addr = succ_cache[comp]
+                        if succ_by_addr.keys() != {gt_addr, le_addr}:
                             break
-                        gt_comp = next(iter(succ for succ in successors if succ.addr == gt_addr))
-                        le_comp = next(iter(succ for succ in successors if succ.addr == le_addr))
+                        gt_comp = succ_by_addr[gt_addr]
+                        le_comp = succ_by_addr[le_addr]
                         if gt_comp in variable_comparisons and le_comp in variable_comparisons:
                             stack.append((gt_comp, value, max_))
                             stack.append((le_comp, min_, value - 1))
@@ -371,127 +451,136 @@ class LoweredSwitchSimplifier(OptimizationPass):
                 if default_case_candidates:
                     cases.append(next(iter(default_case_candidates.values())))
                 v = cases[-1].variable_hash
+                # hash the new case list once; both subset directions below reuse it
+                cases_set = frozenset(cases)
                 for idx, (existing_cases, existing_redundant_nodes) in list(enumerate(varhash_to_caselists[v])):
-                    if self.cases_issubset(existing_cases, cases):
+                    existing_set = frozenset(existing_cases)
+                    if len(existing_cases) <= len(cases) and existing_set <= cases_set:
                         redundant_nodes = list(set(existing_redundant_nodes + extra_cmp_nodes))
                         varhash_to_caselists[v][idx] = cases, redundant_nodes
                         break
-                    if self.cases_issubset(cases, existing_cases):
+                    if len(cases) <= len(existing_cases) and cases_set <= existing_set:
                         break
                 else:
                     varhash_to_caselists[v].append((cases, extra_cmp_nodes))
 
+        # the reachability filter below walks successors/predecessors of every case node; resolve
+        # the adjacency into plain dicts with one pass over the edges instead of querying networkx
+        # per case
+        succs_by_node = {}
+        preds_by_node = {}
+        for u, w in self._graph.edges:
+            succs_by_node.setdefault(u, []).append(w)
+            preds_by_node.setdefault(w, []).append(u)
+
         for v, caselists in list(varhash_to_caselists.items()):
-            for idx, (cases, redundant_nodes) in list(enumerate(caselists)):
-                # filter: there should be at least two non-default cases
-                if len([case for case in cases if case.value != "default"]) < 2:
-                    caselists[idx] = None
-                    continue
-
-                # filter: type-a nodes after the first case node can only have assignments
-                for case in cases[1:]:
-                    if case.value != "default" and case.node_type == "a":
-                        for stmt in case.original_node.statements:
-                            if not isinstance(stmt, (ConditionalJump, Label, Assignment)):
-                                caselists[idx] = None
-                                continue
-
-                # filter: each case is only reachable from a case node
+            # build the surviving list directly; marking rejected entries with None and filtering
+            # afterwards walks the list a second time for nothing. survivors carry the non-default
+            # original nodes collected here, so the rewrite loop does not re-filter the cases.
+            filtered_caselists = []
+            for cases, redundant_nodes in caselists:
                 all_case_nodes = {case.original_node for case in cases}
-                skipped = False
-                for case in cases:
+
+                # run every per-case filter in a single pass over the case list, aborting at the
+                # first failure:
+                # - there should be at least two non-default cases
+                # - type-a nodes after the first case node can only have assignments
+                # - each case is only reachable from a case node
+                ok = True
+                non_default_nodes = []
+                for case_idx, case in enumerate(cases):
+                    if case.value != "default":
+                        non_default_nodes.append(case.original_node)
+                        if (
+                            case_idx > 0
+                            and case.node_type == "a"
+                            and any(
+                                not isinstance(stmt, (ConditionalJump, Label, Assignment))
+                                for stmt in case.original_node.statements
+                            )
+                        ):
+                            ok = False
+                            break
+
                     target_nodes = [
-                        succ for succ in self._graph.successors(case.original_node) if succ.addr == case.target
+                        succ for succ in succs_by_node.get(case.original_node, ()) if succ.addr == case.target
                     ]
                     if len(target_nodes) != 1:
-                        caselists[idx] = None
-                        skipped = True
+                        ok = False
                         break
                     target_node = target_nodes[0]
-                    nonself_preds = {pred for pred in self._graph.predecessors(target_node) if pred.addr == case.target}
+                    nonself_preds = {pred for pred in preds_by_node.get(target_node, ()) if pred.addr == case.target}
                     if not nonself_preds.issubset(all_case_nodes):
-                        caselists[idx] = None
-                        skipped = True
+                        ok = False
                         break
 
-                if skipped:
-                    continue
+                if ok and len(non_default_nodes) >= 2:
+                    filtered_caselists.append((cases, non_default_nodes, redundant_nodes))
 
-            varhash_to_caselists[v] = [item for item in caselists if item is not None]
+            varhash_to_caselists[v] = filtered_caselists
 
         return varhash_to_caselists
 
     @staticmethod
-    def _find_switch_variable_comparison_type_a(
-        node,
-    ) -> Optional[Tuple[int, str, Expression, int, int, int]]:
-        # the type a is the last statement is a var == constant comparison, but
-        # there is more than one non-label statement in the block
-
-        if isinstance(node, Block) and node.statements:
-            stmt = node.statements[-1]
-            if stmt is not None and stmt is not first_nonlabel_statement(node):
-                if (
-                    isinstance(stmt, ConditionalJump)
-                    and isinstance(stmt.true_target, Const)
-                    and isinstance(stmt.false_target, Const)
-                ):
-                    cond = stmt.condition
-                    if isinstance(cond, BinaryOp):
-                        if isinstance(cond.operands[1], Const):
-                            variable_hash = StableVarExprHasher(cond.operands[0]).hash
-                            value = cond.operands[1].value
-                            if cond.op == "CmpEQ":
-                                target = stmt.true_target.value
-                                next_node_addr = stmt.false_target.value
-                            elif cond.op == "CmpNE":
-                                target = stmt.false_target.value
-                                next_node_addr = stmt.true_target.value
-                            else:
-                                return None
-                            return variable_hash, "eq", cond.operands[0], value, target, next_node_addr
-
-        return None
+    def _first_nonlabel_statement_cached(node, cache: Optional[Dict]):
+        if cache is None:
+            return first_nonlabel_statement(node)
+        if node in cache:
+            return cache[node]
+        r = first_nonlabel_statement(node)
+        cache[node] = r
+        return r
 
     @staticmethod
-    def _find_switch_variable_comparison_type_b(
+    def _find_switch_variable_comparison_eq(
         node,
-    ) -> Optional[Tuple[int, str, Expression, int, int, int]]:
-        # the type b is the last statement is a var == constant comparison, and
-        # there is only one non-label statement
+        fnl_cache: Optional[Dict] = None,
+    ) -> Optional[Tuple[str, int, str, Expression, int, int, int]]:
+        # the last statement is a var == constant comparison. type a blocks have more than one
+        # non-label statement, type b blocks exactly one; everything else about the two types is
+        # identical, so classify them in a single walk of the block
 
         if isinstance(node, Block):
-            stmt = first_nonlabel_statement(node)
-            if stmt is not None and stmt is node.statements[-1]:
-                if (
-                    isinstance(stmt, ConditionalJump)
-                    and isinstance(stmt.true_target, Const)
-                    and isinstance(stmt.false_target, Const)
-                ):
-                    cond = stmt.condition
-                    if isinstance(cond, BinaryOp):
-                        if isinstance(cond.operands[1], Const):
-                            variable_hash = StableVarExprHasher(cond.operands[0]).hash
-                            value = cond.operands[1].value
-                            if cond.op == "CmpEQ":
-                                target = stmt.true_target.value
-                                next_node_addr = stmt.false_target.value
-                            elif cond.op == "CmpNE":
-                                target = stmt.false_target.value
-                                next_node_addr = stmt.true_target.value
-                            else:
-                                return None
-                            return variable_hash, "eq", cond.operands[0], value, target, next_node_addr
+            stmts = node.statements
+            if not stmts:
+                return None
+            stmt = stmts[-1]
+            if (
+                isinstance(stmt, ConditionalJump)
+                and isinstance(stmt.true_target, Const)
+                and isinstance(stmt.false_target, Const)
+            ):
+                cond = stmt.condition
+                if isinstance(cond, BinaryOp):
+                    if isinstance(cond.operands[1], Const):
+                        node_type = (
+                            "b"
+                            if stmt is LoweredSwitchSimplifier._first_nonlabel_statement_cached(node, fnl_cache)
+                            else "a"
+                        )
+                        variable_hash = _stable_varhash(cond.operands[0])
+                        value = cond.operands[1].value
+                        if cond.op == "CmpEQ":
+                            target = stmt.true_target.value
+                            next_node_addr = stmt.false_target.value
+                        elif cond.op == "CmpNE":
+                            target = stmt.false_target.value
+                            next_node_addr = stmt.true_target.value
+                        else:
+                            return None
+                        return node_type, variable_hash, "eq", cond.operands[0], value, target, next_node_addr
 
         return None
 
     @staticmethod
-    def _find_switch_variable_comparison_type_c(node) -> Optional[Tuple[int, str, Expression, int, int, int]]:
+    def _find_switch_variable_comparison_type_c(
+        node, fnl_cache: Optional[Dict] = None
+    ) -> Optional[Tuple[int, str, Expression, int, int, int]]:
         # the type c is where the last statement is a var < or > constant comparison, and
         # there is only one non-label statement
 
         if isinstance(node, Block):
-            stmt = first_nonlabel_statement(node)
+            stmt = LoweredSwitchSimplifier._first_nonlabel_statement_cached(node, fnl_cache)
             if stmt is not None and stmt is node.statements[-1]:
                 if (
                     isinstance(stmt, ConditionalJump)
@@ -501,7 +590,7 @@ class LoweredSwitchSimplifier(OptimizationPass):
                     cond = stmt.condition
                     if isinstance(cond, BinaryOp):
                         if isinstance(cond.operands[1], Const):
-                            variable_hash = StableVarExprHasher(cond.operands[0]).hash
+                            variable_hash = _stable_varhash(cond.operands[0])
                             value = cond.operands[1].value
                             op = cond.op
                             if stmt.true_target.value == stmt.false_target.value:
@@ -544,6 +633,11 @@ class LoweredSwitchSimplifier(OptimizationPass):
 
         # non-default nodes
         ca_others = {ca[0].addr: ca for ca in ca_others}
+        # resolve case targets through one addr index instead of scanning full_graph per case.
+        # setdefault keeps the first node per address, matching the old linear scans.
+        addr_to_node = {}
+        for nn in full_graph:
+            addr_to_node.setdefault(nn.addr, nn)
         # extract the AIL block from last_node
         last_block = last_node
         if isinstance(last_block, SequenceNode):
@@ -557,13 +651,14 @@ class LoweredSwitchSimplifier(OptimizationPass):
             onode, value, target, next_node_addr = ca_others[next_node_addr]
             onode: Block
 
-            if first_nonlabel_statement(onode) is not onode.statements[-1]:
-                onode = onode.copy(statements=[onode.statements[-1]])
+            onode_last_stmt = onode.statements[-1]
+            if first_nonlabel_statement(onode) is not onode_last_stmt:
+                onode = onode.copy(statements=[onode_last_stmt])
 
             graph.add_edge(last_node, onode)
             full_graph.add_edge(last_node, onode)
 
-            target_node = next(iter(nn for nn in full_graph if nn.addr == target))
+            target_node = addr_to_node[target]
             graph.add_edge(onode, target_node)
             full_graph.add_edge(onode, target_node)
 
@@ -578,7 +673,7 @@ class LoweredSwitchSimplifier(OptimizationPass):
         # default nodes
         if ca_default:
             onode, value, target, _ = ca_default[0]
-            default_target = next(iter(nn for nn in full_graph if nn.addr == target))
+            default_target = addr_to_node[target]
             graph.add_edge(last_node, default_target)
             full_graph.add_edge(last_node, default_target)
 
@@ -602,6 +697,9 @@ class LoweredSwitchSimplifier(OptimizationPass):
             self._func, graph=graph, cond_proc=ConditionProcessor(self.project.arch), force_loop_single_exit=False,
             complete_successors=True
         )
+        # the deepcopy is required: the region's leaves are the real AIL blocks of self._graph,
+        # and the structurer strips jump statements from them in place. recursive_copy is not
+        # enough as it shares the leaf blocks.
         rs = self.project.analyses[RecursiveStructurer].prep(kb=self.kb)(
             copy.deepcopy(self.ri.region),
             cond_proc=self.ri.cond_proc,
@@ -624,7 +722,5 @@ class LoweredSwitchSimplifier(OptimizationPass):
 
         if len(cases_0) > len(cases_1):
             return False
-        for case in cases_0:
-            if case not in cases_1:
-                return False
-        return True
+        cases_1_set = frozenset(cases_1)
+        return all(case in cases_1_set for case in cases_0)